@@ -1,8 +1,10 @@
 import argparse
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageFont
 
 
 class ImageToASCII:
@@ -14,6 +16,7 @@ class ImageToASCII:
         output_image_path: str | None = None,
         font_size: int | None = 6,
         use_braille: bool = False,
+        use_glyph_palette: bool = False,
     ) -> None:
         self.image = Image.open(image_path).convert("RGB")
         self.output_text_path = output_text_path
@@ -21,6 +24,11 @@ class ImageToASCII:
         self.use_braille = use_braille
         self.characters = self._get_charset()
         self.font = self._load_font(font_path, font_size if font_size is not None else 6)
+        self._char_w, self._char_h = self._char_cell()
+        self._char_lut = np.array(list(self.characters))
+        self._bright_lut = (np.arange(256) * (len(self.characters) - 1) // 255).tolist()
+        self._glyph_atlas = self._build_glyph_atlas()
+        self._glyph_lut = self._build_glyph_lut() if use_glyph_palette else None
 
     def _get_charset(self) -> str:
         return "⠁⠗⠃⠎⠉⠞⠙⠥⠑⠧⠋⠺⠛⠭⠓⠽⠊⠵⠚⠠⠅⠼⠇⠲⠍⠂⠝⠢⠕⠆⠏⠤⠟" if self.use_braille else ".,;!vlLFE$"
@@ -37,11 +45,18 @@ class ImageToASCII:
         fallback = ImageFont.load_default()
         return fallback
 
-    def _get_brightness_array(self) -> np.ndarray:
-        arr = np.asarray(self.image).astype(np.float32)
-        r, g, b = arr[..., 0], arr[..., 1], arr[..., 2]
-        brightness = np.sqrt(0.299 * r**2 + 0.587 * g**2 + 0.114 * b**2) / 255.0
-        return brightness
+    def _get_block_indices(self) -> np.ndarray:
+        width, height = self.image.size
+        char_w, char_h = self._char_w, self._char_h
+        h_blocks = height // char_h
+        w_blocks = width // char_w
+        if h_blocks == 0 or w_blocks == 0:
+            return np.zeros((h_blocks, w_blocks), dtype=np.uint8)
+
+        box = (0, 0, w_blocks * char_w, h_blocks * char_h)
+        small = self.image.resize((w_blocks, h_blocks), Image.BOX, box=box).convert("L")
+        lut = self._glyph_lut if self._glyph_lut is not None else self._bright_lut
+        return np.asarray(small.point(lut))
 
     def _char_cell(self) -> tuple[int, int]:
         sample = self.characters[-1]
@@ -51,50 +66,80 @@ class ImageToASCII:
         return char_w, char_h
 
     def convert_to_ascii_by_blocks(self) -> None:
-        width, height = self.image.size
-        char_w, char_h = self._char_cell()
-
-        brightness = self._get_brightness_array()
-        h_blocks = height // char_h
-        w_blocks = width // char_w
+        idx = self._get_block_indices()
+        ascii_chars = self._char_lut[idx]
 
-        brightness = brightness[: h_blocks * char_h, : w_blocks * char_w]
-
-        brightness_blocks = brightness.reshape(h_blocks, char_h, w_blocks, char_w)
-        avg_brightness = brightness_blocks.mean(axis=(1, 3))
-
-        idx = (avg_brightness * (len(self.characters) - 1)).astype(np.int32)
-        ascii_chars = np.array(list(self.characters))[idx]
-
-        ascii_lines = ["".join(row) for row in ascii_chars]
+        rows, cols = ascii_chars.shape
+        if cols:
+            ascii_lines = np.ascontiguousarray(ascii_chars).view(f"<U{cols}").reshape(rows).tolist()
+        else:
+            ascii_lines = [""] * rows
 
         if self.output_text_path:
             with open(self.output_text_path, "w", encoding="utf-8") as f:
                 f.write("\n".join(ascii_lines))
 
-        if self.output_image_path:
-            self._render_colored_ascii(ascii_lines, char_w, char_h)
+        if self.output_image_path and idx.size:
+            self._render_colored_ascii(idx)
 
         if not self.output_text_path and not self.output_image_path:
             print("\n".join(ascii_lines))
 
-    def _render_colored_ascii(self, ascii_lines: list[str], char_w: int, char_h: int) -> None:
-        cols = len(ascii_lines[0])
-        rows = len(ascii_lines)
-        resized_img = self.image.resize((cols, rows), Image.LANCZOS)
+    def _build_glyph_atlas(self) -> np.ndarray:
+        char_w, char_h = self._char_w, self._char_h
+        glyphs = np.zeros((len(self.characters), char_h, char_w), dtype=np.uint8)
+        bboxes = [self.font.getbbox(ch) for ch in self.characters]
+        min_x0 = min(bbox[0] for bbox in bboxes)
+        min_y0 = min(bbox[1] for bbox in bboxes)
+        for i, ch in enumerate(self.characters):
+            mask = self.font.getmask(ch, mode="L")
+            x0, y0 = bboxes[i][0] - min_x0, bboxes[i][1] - min_y0
+            w, h = mask.size
+            buf = np.frombuffer(bytes(mask), dtype=np.uint8).reshape(h, w)
+
+            top, left = max(y0, 0), max(x0, 0)
+            src = buf[top - y0 : max(char_h - y0, 0), left - x0 : max(char_w - x0, 0)]
+            glyphs[i, top : top + src.shape[0], left : left + src.shape[1]] = src
+        return glyphs
+
+    def _build_glyph_lut(self) -> list[int] | None:
+        density = self._glyph_atlas.mean(axis=(1, 2))
+        span = np.ptp(density)
+        if span == 0:
+            print("Glyphs have identical ink density, falling back to linear mapping", file=sys.stderr)
+            return None
+        levels = (density - density.min()) / span * 255
+        return np.abs(np.arange(256)[:, None] - levels).argmin(axis=1).tolist()
+
+    def _compose_slab(
+        self, row_start: int, row_end: int, idx: np.ndarray, colors: np.ndarray, out: np.ndarray
+    ) -> None:
+        glyphs = self._glyph_atlas[idx[row_start:row_end]].transpose(0, 2, 1, 3)[..., None]
+        slab_colors = colors[row_start:row_end, None, :, None, :]
+        out[row_start:row_end] = (glyphs.astype(np.uint16) * slab_colors + 255) >> 8
+
+    def _render_colored_ascii(self, idx: np.ndarray) -> None:
+        char_w, char_h = self._char_w, self._char_h
+        rows, cols = idx.shape
+        resized_img = self.image.resize((cols, rows), Image.BOX)
         resized_array = np.asarray(resized_img)
 
         output_w = char_w * cols
         output_h = char_h * rows
-        output_img = Image.new("RGB", (output_w, output_h), color=(0, 0, 0))
-        draw = ImageDraw.Draw(output_img)
 
-        for y, line in enumerate(ascii_lines):
-            for x, ch in enumerate(line):
-                color = tuple(resized_array[y, x])
-                draw.text((x * char_w, y * char_h), ch, font=self.font, fill=color)
-
-        output_img = output_img.resize(self.image.size, Image.LANCZOS)
+        tiles = np.empty((rows, char_h, cols, char_w, 3), dtype=np.uint8)
+        workers = min(rows, os.cpu_count() or 1)
+        bounds = np.linspace(0, rows, workers + 1, dtype=int)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(self._compose_slab, start, end, idx, resized_array, tiles)
+                for start, end in zip(bounds[:-1], bounds[1:])
+            ]
+            for future in futures:
+                future.result()
+
+        output_array = tiles.reshape(output_h, output_w, 3)
+        output_img = Image.fromarray(output_array)
         output_img.save(self.output_image_path)
 
 
@@ -103,11 +148,20 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("input_image", help="Path to the input image file")
 
     parser.add_argument("--output-text", default=None, help="Path to save ASCII as text")
-    parser.add_argument("--output-image", default=None, help="Path to save ASCII as an image")
+    parser.add_argument(
+        "--output-image",
+        default=None,
+        help="Path to save ASCII as an image (rendered at glyph resolution)",
+    )
 
     parser.add_argument("--font", default=None, help="Path to a .ttf/.otf font file (optional)")
     parser.add_argument("--font-size", type=int, default=6, help="Font size (default: 6)")
     parser.add_argument("--use-braille", action="store_true", help="Use Braille Unicode characters")
+    parser.add_argument(
+        "--glyph-palette",
+        action="store_true",
+        help="Pick each character by matching block brightness to its glyph's ink density",
+    )
 
     return parser.parse_args()
 
@@ -121,6 +175,7 @@ def main() -> None:
         output_image_path=args.output_image,
         font_size=args.font_size,
         use_braille=args.use_braille,
+        use_glyph_palette=args.glyph_palette,
     )
     converter.convert_to_ascii_by_blocks()
 